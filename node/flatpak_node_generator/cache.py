@@ -162,13 +162,16 @@ class FilesystemBasedCache(Cache):
                 return FilesystemBasedCache.FilesystemBucketReader(fp)
 
         def open_write(self) -> Cache.BucketWriter:
-            target = self._cache_path
-            if not target.parent.exists():
-                target.parent.mkdir(exist_ok=True, parents=True)
+            try:
+                fd, temp = tempfile.mkstemp(dir=self._cache_root, prefix='__temp__')
+            except FileNotFoundError:
+                # Only create the cache directory once writing into it fails, rather
+                # than checking that it exists before every write.
+                self._cache_root.mkdir(exist_ok=True, parents=True)
+                fd, temp = tempfile.mkstemp(dir=self._cache_root, prefix='__temp__')
 
-            fd, temp = tempfile.mkstemp(dir=self._cache_root, prefix='__temp__')
             return FilesystemBasedCache.FilesystemBucketWriter(
-                os.fdopen(fd, 'wb'), Path(temp), target
+                os.fdopen(fd, 'wb'), Path(temp), self._cache_path
             )
 
     @classmethod
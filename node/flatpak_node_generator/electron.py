@@ -2,6 +2,7 @@ from typing import Dict, Iterator, NamedTuple, Optional
 
 import hashlib
 import os.path
+import re
 import urllib.parse
 
 from .integrity import Integrity
@@ -38,6 +39,10 @@ class ElectronBinaryManager:
 
     INTEGRITY_BASE_FILENAME = 'SHASUMS256.txt'
 
+    _SHASUMS_LINE_RE = re.compile(
+        r'^([0-9a-fA-F]+)[ \t]+\*?(\S+)[ \t\r]*$', re.MULTILINE
+    )
+
     def __init__(
         self, version: str, base_url: str, integrities: Dict[str, Integrity]
     ) -> None:
@@ -92,11 +97,12 @@ class ElectronBinaryManager:
             await Requests.instance.read_all(integrity_url, cachable=True)
         ).decode()
 
-        integrities: Dict[str, Integrity] = {}
-        for line in integrity_data.splitlines():
-            digest, star_filename = line.split()
-            filename = star_filename.strip('*')
-            integrities[filename] = Integrity(algorithm='sha256', digest=digest)
+        integrities = {
+            filename: Integrity(algorithm='sha256', digest=digest)
+            for digest, filename in ElectronBinaryManager._SHASUMS_LINE_RE.findall(
+                integrity_data
+            )
+        }
 
         integrities[ElectronBinaryManager.INTEGRITY_BASE_FILENAME] = Integrity.generate(
             integrity_data
@@ -0,0 +1,44 @@
+from typing import Any, Union
+
+import json
+
+# orjson can only indent by two spaces, so that's what indented output always uses.
+INDENT = 2
+
+# orjson is an optional dependency; the stdlib fallback is set up to emit the exact
+# same output, so generated sources don't depend on whether it's installed.
+try:
+    import orjson
+except ImportError:
+    # Passing options to json.dumps sets up a new encoder on every call, so build the
+    # ones we need up front.
+    _ENCODER = json.JSONEncoder(
+        ensure_ascii=False, separators=(',', ':'), check_circular=False
+    )
+    _INDENTED_ENCODER = json.JSONEncoder(
+        ensure_ascii=False, indent=INDENT, check_circular=False
+    )
+
+    def loads(data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return _ENCODER.encode(obj).encode()
+
+    def dumps_indented(obj: Any) -> bytes:
+        return _INDENTED_ENCODER.encode(obj).encode()
+
+else:
+
+    def loads(data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+    # orjson resolves to Any when mypy can't find its stubs; annotating the result
+    # keeps the return type checked without a cast that'd be redundant otherwise.
+    def dumps(obj: Any) -> bytes:
+        data: bytes = orjson.dumps(obj)
+        return data
+
+    def dumps_indented(obj: Any) -> bytes:
+        data: bytes = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        return data
@@ -2,7 +2,9 @@ from typing import Any, NamedTuple, Union
 
 import base64
 import binascii
+import functools
 import hashlib
+import sys
 
 
 class Integrity(NamedTuple):
@@ -10,12 +12,14 @@ class Integrity(NamedTuple):
     digest: str
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def parse(value: str) -> 'Integrity':
         algorithm, encoded_digest = value.split('-', 1)
         assert algorithm.startswith('sha'), algorithm
         digest = binascii.hexlify(base64.b64decode(encoded_digest)).decode()
 
-        return Integrity(algorithm, digest)
+        # There are only a handful of algorithms, so don't keep a copy per package.
+        return Integrity(sys.intern(algorithm), digest)
 
     @staticmethod
     def from_sha1(sha1: str) -> 'Integrity':
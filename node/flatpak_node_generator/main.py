@@ -3,7 +3,6 @@ from typing import Iterator, List, Set
 
 import argparse
 import asyncio
-import json
 import os
 import sys
 
@@ -18,9 +17,15 @@ from .providers.special import SpecialSourceProvider
 from .providers.yarn import YarnProviderFactory
 from .requests import Requests, StubRequests
 
+_SCAN_SKIPPED_DIRS = {'.git', '.hg', '.svn'}
+
 
 def _scan_for_lockfiles(base: Path, patterns: List[str]) -> Iterator[Path]:
-    for root, _, files in os.walk(base.parent):
+    for root, dirs, files in os.walk(base.parent):
+        # VCS metadata can be huge & never has lockfiles worth processing. (Lockfiles
+        # under node_modules can be, see "recursive package.jsons" in the README.)
+        dirs[:] = [d for d in dirs if d not in _SCAN_SKIPPED_DIRS]
+
         if base.name in files:
             lockfile = Path(root) / base.name
             if not patterns or any(map(lockfile.match, patterns)):
@@ -141,6 +146,7 @@ async def _async_main() -> None:
     args = parser.parse_args()
 
     Requests.retries = args.retries
+    Requests.connection_limit = args.max_parallel * 2
 
     if args.type == 'yarn' and (args.no_devel or args.no_autopatch):
         sys.exit('--no-devel and --no-autopatch do not apply to Yarn.')
@@ -190,19 +196,21 @@ async def _async_main() -> None:
     print('Reading packages from lockfiles...')
     packages: Set[Package] = set()
     rcfile_node_headers: Set[NodeHeaders] = set()
+    rcfile_providers = provider_factory.create_rcfile_providers()
 
     for lockfile in lockfiles:
         lockfile_provider = provider_factory.create_lockfile_provider()
-        rcfile_providers = provider_factory.create_rcfile_providers()
 
         packages.update(lockfile_provider.process_lockfile(lockfile))
 
         for rcfile_provider in rcfile_providers:
             rcfile = lockfile.parent / rcfile_provider.RCFILE_NAME
-            if rcfile.is_file():
+            try:
                 nh = rcfile_provider.get_node_headers(rcfile)
-                if nh is not None:
-                    rcfile_node_headers.add(nh)
+            except FileNotFoundError:
+                continue
+            if nh is not None:
+                rcfile_node_headers.add(nh)
 
     print(f'{len(packages)} packages read.')
 
@@ -229,7 +237,9 @@ async def _async_main() -> None:
                 await progress.run()
         for headers in rcfile_node_headers:
             print(f'Generating headers {headers.runtime} @ {headers.target}')
-            await special.generate_node_headers(headers)
+        # Each of these is a separate download, so there's no reason to wait on them
+        # one by one.
+        await asyncio.gather(*map(special.generate_node_headers, rcfile_node_headers))
 
         if args.xdg_layout:
             script_name = 'setup_sdk_node_headers.sh'
@@ -246,32 +256,36 @@ async def _async_main() -> None:
             )
             gen.add_command(f'bash {gen.data_root / script_name}')
 
+    output = Path(args.output)
+    written = gen.write_sources(output, split=args.split)
+
     if args.split:
-        i = 0
-        for i, part in enumerate(gen.split_sources()):
-            output = Path(args.output)
-            output = output.with_suffix(f'.{i}{output.suffix}')
-            with open(output, 'w') as fp:
-                json.dump(part, fp, indent=ManifestGenerator.JSON_INDENT)
-
-        print(f'Wrote {gen.source_count} to {i + 1} file(s).')
+        print(f'Wrote {gen.source_count} to {len(written)} file(s).')
     else:
-        with open(args.output, 'w') as fp:
-            json.dump(
-                list(gen.ordered_sources()),
-                fp,
-                indent=ManifestGenerator.JSON_INDENT,
+        if output.stat().st_size >= ManifestGenerator.MAX_GITHUB_SIZE:
+            print(
+                'WARNING: generated-sources.json is too large for GitHub.',
+                file=sys.stderr,
             )
-
-            if fp.tell() >= ManifestGenerator.MAX_GITHUB_SIZE:
-                print(
-                    'WARNING: generated-sources.json is too large for GitHub.',
-                    file=sys.stderr,
-                )
-                print('  (Pass -s to enable splitting.)')
+            print('  (Pass -s to enable splitting.)')
 
         print(f'Wrote {gen.source_count} source(s).')
 
 
+async def _run() -> None:
+    try:
+        await _async_main()
+    finally:
+        await Requests.instance.close()
+
+
 def main() -> None:
-    asyncio.run(_async_main())
+    # uvloop is an optional, faster drop-in replacement for the default event loop.
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    asyncio.run(_run())
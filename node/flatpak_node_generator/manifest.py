@@ -1,32 +1,33 @@
 from pathlib import Path
 from typing import (
+    IO,
     Any,
     ContextManager,
     Dict,
     Iterator,
     List,
     Optional,
-    Set,
     Tuple,
     Type,
     Union,
 )
 
 import base64
-import json
 import types
 
+from . import fastjson
 from .integrity import Integrity
 
 
 class ManifestGenerator(ContextManager['ManifestGenerator']):
     MAX_GITHUB_SIZE = 49 * 1000 * 1000
-    JSON_INDENT = 4
+    JSON_INDENT = fastjson.INDENT
 
     def __init__(self) -> None:
-        # Store the dicts as a set of tuples, then rebuild the dict when returning it.
-        # That way, we ensure uniqueness.
-        self._sources: Set[Tuple[Tuple[str, Any], ...]] = set()
+        # Key the dicts by their sorted items to ensure uniqueness regardless of the
+        # order keys were inserted in, keeping the original dicts around so they don't
+        # need to be rebuilt when returning them.
+        self._sources: Dict[Tuple[Tuple[str, Any], ...], Dict[str, Any]] = {}
         self._commands: List[str] = []
 
     def __exit__(
@@ -50,30 +51,78 @@ class ManifestGenerator(ContextManager['ManifestGenerator']):
         return len(self._sources)
 
     def ordered_sources(self) -> Iterator[Dict[Any, Any]]:
-        return map(dict, sorted(self._sources))
-
-    def split_sources(self) -> Iterator[List[Dict[Any, Any]]]:
-        BASE_CURRENT_SIZE = len('[\n]')
-        current_size = BASE_CURRENT_SIZE
-        current: List[Dict[Any, Any]] = []
+        return iter(
+            sorted(self._sources.values(), key=lambda source: tuple(source.items()))
+        )
 
+    def _iter_source_json(self) -> Iterator[bytes]:
         for source in self.ordered_sources():
-            # Generate one source by itself, then check the length without the closing and
-            # opening brackets.
-            source_json = json.dumps([source], indent=ManifestGenerator.JSON_INDENT)
-            source_json_len = len('\n'.join(source_json.splitlines()[1:-1]))
-            if current_size + source_json_len >= ManifestGenerator.MAX_GITHUB_SIZE:
-                yield current
-                current = []
-                current_size = BASE_CURRENT_SIZE
-            current.append(source)
-            current_size += source_json_len
-
-        if current:
-            yield current
+            # Serialize each source inside a list, then strip the brackets, so that it's
+            # indented exactly like it would be when dumping the whole list at once.
+            yield fastjson.dumps_indented([source])[len(b'[\n') : -len(b'\n]')]
+
+    def write_sources(self, output: Path, *, split: bool = False) -> List[Path]:
+        """Writes the sources as a JSON list to the output path, one source at a time.
+
+        If split is set, the sources are spread across output.0.json, output.1.json,
+        etc., each smaller than MAX_GITHUB_SIZE. Returns the paths of written files.
+        """
+        SEPARATOR = b',\n'
+        CLOSING = b'\n]'
+
+        paths: List[Path] = []
+        fp: Optional[IO[bytes]] = None
+        current_size = 0
+
+        parent, stem, suffix = output.parent, output.stem, output.suffix
+
+        def open_next() -> IO[bytes]:
+            path = output
+            if split:
+                path = parent / f'{stem}.{len(paths)}{suffix}'
+
+            paths.append(path)
+            return path.open('wb')
+
+        try:
+            for source_json in self._iter_source_json():
+                if fp is not None:
+                    if (
+                        split
+                        and current_size
+                        + len(SEPARATOR)
+                        + len(source_json)
+                        + len(CLOSING)
+                        >= ManifestGenerator.MAX_GITHUB_SIZE
+                    ):
+                        fp.write(CLOSING)
+                        fp.close()
+                        fp = None
+                    else:
+                        fp.write(SEPARATOR)
+                        current_size += len(SEPARATOR)
+
+                if fp is None:
+                    fp = open_next()
+                    fp.write(b'[\n')
+                    current_size = len(b'[\n')
+
+                fp.write(source_json)
+                current_size += len(source_json)
+
+            if fp is None:
+                with open_next() as empty_fp:
+                    empty_fp.write(b'[]')
+            else:
+                fp.write(CLOSING)
+        finally:
+            if fp is not None:
+                fp.close()
+
+        return paths
 
     def _add_source(self, source: Dict[str, Any]) -> None:
-        self._sources.add(tuple(source.items()))
+        self._sources.setdefault(tuple(sorted(source.items())), source)
 
     def _add_source_with_destination(
         self,
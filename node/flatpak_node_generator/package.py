@@ -18,10 +18,18 @@ class SemVer:
 
     @functools.total_ordering
     class Prerelease:
+        __slots__ = ('_parts', '_sort_key')
+
         def __init__(self, parts: Tuple[Union[str, int], ...]) -> None:
             self._parts = parts
+            # Number parts are always less than strings, so tag each part with its
+            # kind; comparisons are then just a comparison of the tuples.
+            self._sort_key = tuple(
+                (0, part) if isinstance(part, int) else (1, part) for part in parts
+            )
 
         @staticmethod
+        @functools.lru_cache(maxsize=None)
         def parse(rel: str) -> Optional['SemVer.Prerelease']:
             if not rel:
                 return None
@@ -46,15 +54,7 @@ class SemVer:
             if not isinstance(other, SemVer.Prerelease):
                 return NotImplemented
 
-            for our_part, other_part in zip(self._parts, other._parts):
-                if type(our_part) == type(other_part):
-                    if our_part < other_part:  # type: ignore
-                        return True
-                # Number parts are always less than strings.
-                elif isinstance(our_part, int):
-                    return True
-
-            return len(self._parts) < len(other._parts)
+            return self._sort_key < other._sort_key
 
         def __eq__(self, other: object) -> bool:
             if not isinstance(other, SemVer.Prerelease):
@@ -62,6 +62,9 @@ class SemVer:
 
             return self._parts == other._parts
 
+        def __hash__(self) -> int:
+            return hash(self._parts)
+
         def __repr__(self) -> str:
             return f'Prerelease(parts={self.parts})'
 
@@ -71,6 +74,7 @@ class SemVer:
     prerelease: Optional[Prerelease] = None
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def parse(version: str) -> 'SemVer':
         match = SemVer._SEMVER_RE.match(version)
         if match is None:
@@ -83,16 +87,22 @@ class SemVer:
 
 
 class PackageSource(abc.ABC):
-    pass
+    # There's a source for every package, so keep them small by not giving them a
+    # __dict__; subclasses list just the fields they add.
+    __slots__ = ()
 
 
 @dataclass(frozen=True, eq=True)
 class PackageFileSource(PackageSource):
+    __slots__ = ('integrity',)
+
     integrity: Optional[Integrity]
 
 
 @dataclass(frozen=True, eq=True)
 class PackageURLSource(PackageFileSource):
+    __slots__ = ('resolved',)
+
     resolved: str
 
     async def retrieve_integrity(self) -> Integrity:
@@ -107,16 +117,18 @@ class PackageURLSource(PackageFileSource):
 
 @dataclass(frozen=True, eq=True)
 class RegistrySource(PackageFileSource):
-    pass
+    __slots__ = ()
 
 
 @dataclass(frozen=True, eq=True)
 class ResolvedSource(RegistrySource, PackageURLSource):
-    pass
+    __slots__ = ()
 
 
 @dataclass(frozen=True, eq=True)
 class GitSource(PackageSource):
+    __slots__ = ('original', 'url', 'commit', 'from_')
+
     original: str
     url: str
     commit: str
@@ -125,6 +137,8 @@ class GitSource(PackageSource):
 
 @dataclass(frozen=True, eq=True)
 class LocalSource(PackageSource):
+    __slots__ = ('path',)
+
     path: str
 
 
@@ -3,6 +3,7 @@ from typing import Collection, ContextManager, Optional, Type
 import asyncio
 import shutil
 import sys
+import time
 import types
 
 from .package import Package
@@ -10,6 +11,9 @@ from .providers import ModuleProvider
 
 
 class GeneratorProgress(ContextManager['GeneratorProgress']):
+    # Packages tend to finish in bursts, so don't redraw more often than this.
+    UPDATE_INTERVAL = 0.1
+
     def __init__(
         self,
         packages: Collection[Package],
@@ -22,6 +26,7 @@ class GeneratorProgress(ContextManager['GeneratorProgress']):
         self.parallel_limit = asyncio.Semaphore(max_parallel)
         self.previous_package: Optional[Package] = None
         self.current_package: Optional[Package] = None
+        self._last_update = 0.0
 
     def __exit__(
         self,
@@ -29,6 +34,7 @@ class GeneratorProgress(ContextManager['GeneratorProgress']):
         exc_value: Optional[BaseException],
         tb: Optional[types.TracebackType],
     ) -> None:
+        self._update(force=True)
         print()
 
     def _format_package(self, package: Package, max_width: int) -> str:
@@ -39,20 +45,21 @@ class GeneratorProgress(ContextManager['GeneratorProgress']):
 
         return result
 
-    def _update(self) -> None:
-        columns, _ = shutil.get_terminal_size()
-
-        sys.stdout.write('\r' + ' ' * columns)
+    def _update(self, *, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_update < self.UPDATE_INTERVAL:
+            return
+        self._last_update = now
 
-        prefix_string = f'\rGenerating packages [{self.finished}/{len(self.packages)}] '
-        sys.stdout.write(prefix_string)
-        max_package_width = columns - len(prefix_string)
+        columns, _ = shutil.get_terminal_size()
 
+        line = f'Generating packages [{self.finished}/{len(self.packages)}] '
         if self.current_package is not None:
-            sys.stdout.write(
-                self._format_package(self.current_package, max_package_width)
-            )
+            line += self._format_package(self.current_package, columns - len(line) - 1)
 
+        # Pad the line out instead of blanking it first, so every repaint is a
+        # single write of one terminal line.
+        sys.stdout.write('\r' + line.ljust(columns))
         sys.stdout.flush()
 
     def _update_with_package(self, package: Package) -> None:
@@ -70,7 +77,7 @@ class GeneratorProgress(ContextManager['GeneratorProgress']):
             self._update_with_package(package)
 
     async def run(self) -> None:
-        self._update()
+        self._update(force=True)
 
         tasks = [asyncio.create_task(self._generate(pkg)) for pkg in self.packages]
         for coro in asyncio.as_completed(tasks):
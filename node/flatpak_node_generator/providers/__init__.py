@@ -48,14 +48,15 @@ class LockfileProvider:
 class RCFileProvider:
     RCFILE_NAME: str
 
+    _PARSER_RE = re.compile(
+        r'^(?!#|;)(\S+)(?:\s+|\s*=\s*)(?:"(.+)"|(\S+))$', re.MULTILINE
+    )
+
     def parse_rcfile(self, rcfile: Path) -> Dict[str, str]:
         with open(rcfile, 'r') as r:
             rcfile_text = r.read()
-        parser_re = re.compile(
-            r'^(?!#|;)(\S+)(?:\s+|\s*=\s*)(?:"(.+)"|(\S+))$', re.MULTILINE
-        )
         result: Dict[str, str] = {}
-        for key, quoted_val, val in parser_re.findall(rcfile_text):
+        for key, quoted_val, val in self._PARSER_RE.findall(rcfile_text):
             result[key] = quoted_val or val
         return result
 
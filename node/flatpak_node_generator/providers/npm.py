@@ -8,19 +8,21 @@ from typing import (
     NamedTuple,
     Optional,
     Set,
+    Tuple,
     Type,
 )
 
 import asyncio
 import collections
 import functools
-import json
 import re
 import shlex
+import sys
 import textwrap
 import types
 import urllib.parse
 
+from .. import fastjson
 from ..integrity import Integrity
 from ..manifest import ManifestGenerator
 from ..package import (
@@ -41,8 +43,47 @@ _NPM_CORGIDOC = (
     'application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8, */*'
 )
 
+_GIT_URL_PREFIX = 'git+'
+
+# jq scripts used to patch Git sources in package*.json files.
+_GIT_PATCH_JQ_SCRIPTS = {
+    'package.json': r"""
+        walk(
+            if type == "object"
+            then
+                to_entries | map(
+                    if (.value | type == "string") and $data[.value]
+                    then .value = "git+file:\($buildroot)/\($data[.value])"
+                    else .
+                    end
+                ) | from_entries
+            else .
+            end
+        )
+    """,
+    'package-lock.json': r"""
+        walk(
+            if type == "object" and (.version | type == "string") and $data[.version]
+            then
+                .version = "git+file:\($buildroot)/\($data[.version])"
+            else .
+            end
+        )
+    """,
+}
+
+# The scripts end up as single-line, quoted command line arguments, so only do that
+# once instead of for every lockfile.
+_GIT_PATCH_JQ_ARGS = {
+    filename: shlex.quote(
+        textwrap.dedent(script.lstrip('\n')).strip().replace('\n', '')
+    )
+    for filename, script in _GIT_PATCH_JQ_SCRIPTS.items()
+}
+
 
 class NpmLockfileProvider(LockfileProvider):
+    _ALIAS_PREFIX = 'npm:'
     _ALIAS_RE = re.compile(r'^npm:(.[^@]*)@(.*)$')
     _PACKAGE_PREFIX_RE = re.compile(r'^(?P<prefix>[^@:]+@)[^@:]+:')
 
@@ -55,50 +96,70 @@ class NpmLockfileProvider(LockfileProvider):
     def _process_packages_v1(
         self, lockfile: Path, entry: Dict[str, Dict[Any, Any]]
     ) -> Iterator[Package]:
-        for name, info in entry.get('dependencies', {}).items():
-            if info.get('dev') and self.no_devel:
-                continue
-            elif info.get('bundled'):
-                continue
-
-            version: str = info['version']
-            version_url = urllib.parse.urlparse(version)
-            alias_match = self._ALIAS_RE.match(version)
-            if alias_match is not None:
-                name, version = alias_match.groups()
-
-            source: PackageSource
-            from_ = info.get('from')
-            if from_ is not None:
-                # Strip off the package name.
-                match = self._PACKAGE_PREFIX_RE.match(from_)
-                if match is not None:
-                    from_ = from_[match.end('prefix') :]
-
-                source = self.parse_git_source(version, from_)
-            elif version_url.scheme == 'file':
-                source = LocalSource(path=version_url.path)
-            else:
-                integrity = Integrity.parse(info['integrity'])
-                if 'resolved' in info:
-                    source = ResolvedSource(
-                        resolved=info['resolved'], integrity=integrity
-                    )
-                elif version_url.scheme in {'http', 'https'}:
-                    source = PackageURLSource(resolved=version, integrity=integrity)
+        # Walk the nested dependencies depth-first with an explicit stack of iterators
+        # instead of recursing, so deep trees don't need a generator per level.
+        stack = [iter(entry.get('dependencies', {}).items())]
+        # Check the flag first, so that the common case of keeping dev dependencies
+        # doesn't need to look at every package's info.
+        no_devel = self.no_devel
+        while stack:
+            for name, info in stack[-1]:
+                if no_devel and info.get('dev'):
+                    continue
+                elif info.get('bundled'):
+                    continue
+
+                version: str = info['version']
+                version_url = urllib.parse.urlparse(version)
+                # Most versions aren't aliases, so don't bother running the regex.
+                if version.startswith(self._ALIAS_PREFIX):
+                    alias_match = self._ALIAS_RE.match(version)
+                    if alias_match is not None:
+                        name, version = alias_match.groups()
+
+                source: PackageSource
+                from_ = info.get('from')
+                if from_ is not None:
+                    # Strip off the package name, if there's any prefix to match at all.
+                    if '@' in from_ and ':' in from_:
+                        match = self._PACKAGE_PREFIX_RE.match(from_)
+                        if match is not None:
+                            from_ = from_[match.end('prefix') :]
+
+                    source = self.parse_git_source(version, from_)
+                elif version_url.scheme == 'file':
+                    source = LocalSource(path=version_url.path)
                 else:
-                    source = RegistrySource(integrity=integrity)
-
-            yield Package(name=name, version=version, source=source, lockfile=lockfile)
+                    integrity = Integrity.parse(info['integrity'])
+                    if 'resolved' in info:
+                        source = ResolvedSource(
+                            resolved=info['resolved'], integrity=integrity
+                        )
+                    elif version_url.scheme in {'http', 'https'}:
+                        source = PackageURLSource(resolved=version, integrity=integrity)
+                    else:
+                        source = RegistrySource(integrity=integrity)
+
+                # The same package names recur all over the lockfiles, so share them.
+                yield Package(
+                    name=sys.intern(name),
+                    version=version,
+                    source=source,
+                    lockfile=lockfile,
+                )
 
-            if 'dependencies' in info:
-                yield from self._process_packages_v1(lockfile, info)
+                if 'dependencies' in info:
+                    stack.append(iter(info['dependencies'].items()))
+                    break
+            else:
+                stack.pop()
 
     def _process_packages_v2(
         self, lockfile: Path, entry: Dict[str, Dict[Any, Any]]
     ) -> Iterator[Package]:
+        no_devel = self.no_devel
         for install_path, info in entry.get('packages', {}).items():
-            if (info.get('dev') or info.get('devOptional')) and self.no_devel:
+            if no_devel and (info.get('dev') or info.get('devOptional')):
                 continue
             if info.get('link'):
                 # NOTE We're not interested in symlinks, NPM will create them at install time
@@ -109,14 +170,16 @@ class NpmLockfileProvider(LockfileProvider):
 
             source: PackageSource
             package_json_path = lockfile.parent / install_path / 'package.json'
+            # Packages installed under node_modules are never local sources, so skip
+            # looking for their package.json on disk; that's almost every package.
             if (
-                'node_modules' not in package_json_path.parents
+                'node_modules' not in install_path.split('/')
                 and package_json_path.exists()
             ):
                 source = LocalSource(path=install_path)
                 if name is None:
                     with package_json_path.open('rb') as fp:
-                        name = json.load(fp)['name']
+                        name = fastjson.loads(fp.read())['name']
             elif 'resolved' in info:
                 resolved_url = urllib.parse.urlparse(info['resolved'])
                 if resolved_url.scheme == 'file':
@@ -148,15 +211,15 @@ class NpmLockfileProvider(LockfileProvider):
                 name = '/'.join(path_list[-path_list[::-1].index('node_modules') :])
 
             yield Package(
-                name=name,
+                name=sys.intern(name),
                 version=info.get('version'),
                 lockfile=lockfile,
                 source=source,
             )
 
     def process_lockfile(self, lockfile: Path) -> Iterator[Package]:
-        with open(lockfile) as fp:
-            data = json.load(fp)
+        with open(lockfile, 'rb') as fp:
+            data = fastjson.loads(fp.read())
 
         # TODO Once lockfile v2 syntax support is complete, use _process_packages_v2
         # for both v2 and v2 lockfiles
@@ -175,6 +238,12 @@ class NpmRCFileProvider(RCFileProvider):
 
 
 class NpmModuleProvider(ModuleProvider):
+    # The compact JSON of a cacache index entry, which always has the same shape.
+    _INDEX_ENTRY_TEMPLATE = (
+        '{{"key":{key},"integrity":"{integrity}","time":0,"size":{size},'
+        '"metadata":{{"url":{url},"reqHeaders":{request_headers},"resHeaders":{{}}}}}}'
+    )
+
     class Options(NamedTuple):
         registry: str
         no_autopatch: bool
@@ -200,11 +269,16 @@ class NpmModuleProvider(ModuleProvider):
         self.no_trim_index = options.no_trim_index
         self.npm_cache_dir = self.gen.data_root / 'npm-cache'
         self.cacache_dir = self.npm_cache_dir / '_cacache'
+        self.cacache_index_dir = self.cacache_dir / 'index-v5'
+        self.cacache_content_dir = self.cacache_dir / 'content-v2'
         # Awaitable so multiple tasks can be waiting on the same package info.
         self.registry_packages: Dict[
             str, asyncio.Future[NpmModuleProvider.RegistryPackageIndex]
         ] = {}
-        self.index_entries: Dict[Path, str] = {}
+        self.resolved_sources: Dict[
+            Tuple[str, str, RegistrySource], ResolvedSource
+        ] = {}
+        self.index_entries: Dict[str, Tuple[RemoteUrlMetadata, Dict[str, str]]] = {}
         self.all_lockfiles: Set[Path] = set()
         # Mapping of lockfiles to a dict of the Git source target paths and GitSource objects.
         self.git_sources: DefaultDict[
@@ -223,24 +297,20 @@ class NpmModuleProvider(ModuleProvider):
         if exc_type is None:
             self._finalize()
 
-    def get_cacache_integrity_path(self, integrity: Integrity) -> Path:
+    @staticmethod
+    def _get_cacache_integrity_subpath(integrity: Integrity) -> str:
+        # Build the whole path as a string, since every join of Path objects has to
+        # parse & copy the parts again.
         digest = integrity.digest
-        return Path(digest[0:2]) / digest[2:4] / digest[4:]
+        return f'{digest[0:2]}/{digest[2:4]}/{digest[4:]}'
 
     def get_cacache_index_path(self, integrity: Integrity) -> Path:
-        return (
-            self.cacache_dir
-            / Path('index-v5')
-            / self.get_cacache_integrity_path(integrity)
-        )
+        subpath = self._get_cacache_integrity_subpath(integrity)
+        return self.cacache_index_dir / subpath
 
     def get_cacache_content_path(self, integrity: Integrity) -> Path:
-        return (
-            self.cacache_dir
-            / Path('content-v2')
-            / integrity.algorithm
-            / self.get_cacache_integrity_path(integrity)
-        )
+        subpath = self._get_cacache_integrity_subpath(integrity)
+        return self.cacache_content_dir / f'{integrity.algorithm}/{subpath}'
 
     def add_index_entry(
         self,
@@ -248,54 +318,67 @@ class NpmModuleProvider(ModuleProvider):
         metadata: RemoteUrlMetadata,
         request_headers: Dict[str, str] = {},
     ) -> None:
-        key = f'make-fetch-happen:request-cache:{url}'
+        # The same URL can be added by many packages (e.g. the same dependency in
+        # multiple lockfiles), so only render the entries once, when finalizing.
+        self.index_entries[url] = (metadata, request_headers)
 
-        index_json = json.dumps(
-            {
-                'key': key,
-                'integrity': f'{metadata.integrity.algorithm}-{metadata.integrity.to_base64()}',
-                'time': 0,
-                'size': metadata.size,
-                'metadata': {
-                    'url': url,
-                    'reqHeaders': request_headers,
-                    'resHeaders': {},
-                },
-            }
+    def _render_index_entry(
+        self,
+        url: str,
+        metadata: RemoteUrlMetadata,
+        request_headers: Dict[str, str],
+    ) -> Tuple[Path, str]:
+        key = f'make-fetch-happen:request-cache:{url}'
+        integrity = metadata.integrity
+
+        # Only the strings that might need escaping go through the encoder.
+        index_json = self._INDEX_ENTRY_TEMPLATE.format(
+            key=fastjson.dumps(key).decode(),
+            integrity=f'{integrity.algorithm}-{integrity.to_base64()}',
+            size=metadata.size,
+            url=fastjson.dumps(url).decode(),
+            request_headers=fastjson.dumps(request_headers).decode(),
         )
 
         content_integrity = Integrity.generate(index_json, algorithm='sha1')
         index = '\t'.join((content_integrity.digest, index_json))
 
         key_integrity = Integrity.generate(key)
-        index_path = self.get_cacache_index_path(key_integrity)
-        self.index_entries[index_path] = index
+        return self.get_cacache_index_path(key_integrity), index
 
     async def resolve_source(self, package: Package) -> ResolvedSource:
         assert isinstance(package.source, RegistrySource)
 
+        # The same package is often locked in multiple lockfiles.
+        resolved_key = (package.name, package.version, package.source)
+        resolved = self.resolved_sources.get(resolved_key)
+        if resolved is not None:
+            return resolved
+
         # These results are going to be the same each time.
         if package.name not in self.registry_packages:
-            cache_future = asyncio.get_event_loop().create_future()
+            cache_future = asyncio.get_running_loop().create_future()
             self.registry_packages[package.name] = cache_future
 
             data_url = f'{self.get_package_registry(package)}/{package.name.replace("/", "%2f")}'
             # NOTE: Not cachable, because this is an API call.
-            raw_data = await Requests.instance.read_all(data_url, cachable=False)
-            data = json.loads(raw_data)
+            # Ask for the abbreviated metadata npm itself installs from (and which the
+            # index entry claims to be), skipping the huge readmes & such in full docs.
+            raw_data = await Requests.instance.read_all(
+                data_url, cachable=False, headers={'accept': _NPM_CORGIDOC}
+            )
+            data = fastjson.loads(raw_data)
 
             assert 'versions' in data, f'{data_url} returned an invalid package index'
+            if not self.no_trim_index:
+                data = {'versions': data['versions']}
+
             cache_future.set_result(
                 NpmModuleProvider.RegistryPackageIndex(
                     url=data_url, data=data, used_versions=set()
                 )
             )
 
-            if not self.no_trim_index:
-                for key in list(data):
-                    if key != 'versions':
-                        del data[key]
-
         index = await self.registry_packages[package.name]
 
         versions = index.data['versions']
@@ -334,7 +417,9 @@ class NpmModuleProvider(ModuleProvider):
         else:
             integrity = registry_integrity
 
-        return ResolvedSource(resolved=dist['tarball'], integrity=integrity)
+        resolved = ResolvedSource(resolved=dist['tarball'], integrity=integrity)
+        self.resolved_sources[resolved_key] = resolved
+        return resolved
 
     async def generate_package(self, package: Package) -> None:
         self.all_lockfiles.add(package.lockfile)
@@ -387,8 +472,10 @@ class NpmModuleProvider(ModuleProvider):
     def get_lockfile_rc(self, lockfile: Path) -> Dict[str, str]:
         rc = {}
         rcfile_path = lockfile.parent / self.rcfile_provider.RCFILE_NAME
-        if rcfile_path.is_file():
+        try:
             rc.update(self.rcfile_provider.parse_rcfile(rcfile_path))
+        except FileNotFoundError:
+            pass
         return rc
 
     def get_package_registry(self, package: Package) -> str:
@@ -405,17 +492,21 @@ class NpmModuleProvider(ModuleProvider):
             index = async_index.result()
 
             if not self.no_trim_index:
-                for version in list(index.data['versions'].keys()):
-                    if version not in index.used_versions:
-                        del index.data['versions'][version]
+                index.data['versions'] = {
+                    version: info
+                    for version, info in index.data['versions'].items()
+                    if version in index.used_versions
+                }
 
-            raw_data = json.dumps(index.data).encode()
+            raw_data = fastjson.dumps(index.data)
 
             metadata = RemoteUrlMetadata(
                 integrity=Integrity.generate(raw_data), size=len(raw_data)
             )
             content_path = self.get_cacache_content_path(metadata.integrity)
-            self.gen.add_data_source(raw_data, content_path)
+            # The index is UTF-8 JSON, so store it as text; passing the bytes would
+            # base64 encode it, growing the generated sources by a third.
+            self.gen.add_data_source(raw_data.decode(), content_path)
             self.add_index_entry(
                 index.url, metadata, request_headers={'accept': _NPM_CORGIDOC}
             )
@@ -425,72 +516,43 @@ class NpmModuleProvider(ModuleProvider):
         )
 
         if self.git_sources:
-            # Generate jq scripts to patch the package*.json files.
-            scripts = {
-                'package.json': r"""
-                    walk(
-                        if type == "object"
-                        then
-                            to_entries | map(
-                                if (.value | type == "string") and $data[.value]
-                                then .value = "git+file:\($buildroot)/\($data[.value])"
-                                else .
-                                end
-                            ) | from_entries
-                        else .
-                        end
-                    )
-                """,
-                'package-lock.json': r"""
-                    walk(
-                        if type == "object" and (.version | type == "string") and $data[.version]
-                        then
-                            .version = "git+file:\($buildroot)/\($data[.version])"
-                        else .
-                        end
-                    )
-                """,
-            }
-
             for lockfile, sources in self.git_sources.items():
                 prefix = self.relative_lockfile_dir(lockfile)
-                data: Dict[str, Dict[str, str]] = {
-                    'package.json': {},
-                    'package-lock.json': {},
-                }
+                package_json_data: Dict[str, str] = {}
+                package_lock_data: Dict[str, str] = {}
 
                 for path, source in sources.items():
-                    GIT_URL_PREFIX = 'git+'
-
                     new_version = f'{path}#{source.commit}'
                     assert source.from_ is not None
-                    data['package.json'][source.from_] = new_version
-                    data['package-lock.json'][source.original] = new_version
+                    package_json_data[source.from_] = new_version
+                    package_lock_data[source.original] = new_version
 
-                    if source.from_.startswith(GIT_URL_PREFIX):
-                        data['package.json'][
-                            source.from_[len(GIT_URL_PREFIX) :]
+                    if source.from_.startswith(_GIT_URL_PREFIX):
+                        package_json_data[
+                            source.from_[len(_GIT_URL_PREFIX) :]
                         ] = new_version
 
-                    if source.original.startswith(GIT_URL_PREFIX):
-                        data['package-lock.json'][
-                            source.original[len(GIT_URL_PREFIX) :]
+                    if source.original.startswith(_GIT_URL_PREFIX):
+                        package_lock_data[
+                            source.original[len(_GIT_URL_PREFIX) :]
                         ] = new_version
 
-                for filename, script in scripts.items():
+                data = {
+                    'package.json': package_json_data,
+                    'package-lock.json': package_lock_data,
+                }
+                commands = patch_commands[lockfile]
+                for filename, script_arg in _GIT_PATCH_JQ_ARGS.items():
                     target = Path('$FLATPAK_BUILDER_BUILDDIR') / prefix / filename
-                    script = (
-                        textwrap.dedent(script.lstrip('\n')).strip().replace('\n', '')
-                    )
-                    json_data = json.dumps(data[filename])
-                    patch_commands[lockfile].append(
+                    json_data = fastjson.dumps(data[filename]).decode()
+                    commands.append(
                         'jq'
                         ' --arg buildroot "$FLATPAK_BUILDER_BUILDDIR"'
                         f' --argjson data {shlex.quote(json_data)}'
-                        f' {shlex.quote(script)} {target}'
+                        f' {script_arg} {target}'
                         f' > {target}.new'
                     )
-                    patch_commands[lockfile].append(f'mv {target}{{.new,}}')
+                    commands.append(f'mv {target}{{.new,}}')
 
         patch_all_commands: List[str] = []
         for lockfile in self.all_lockfiles:
@@ -510,9 +572,9 @@ class NpmModuleProvider(ModuleProvider):
             # FLATPAK_BUILDER_BUILDDIR isn't defined yet for script sources.
             self.gen.add_command(f'FLATPAK_BUILDER_BUILDDIR=$PWD {patch_all_dest}')
 
-        if self.index_entries:
-            for path, entry in self.index_entries.items():
-                self.gen.add_data_source(entry, path)
+        for url, (metadata, request_headers) in self.index_entries.items():
+            path, entry = self._render_index_entry(url, metadata, request_headers)
+            self.gen.add_data_source(entry, path)
 
 
 class NpmProviderFactory(ProviderFactory):
@@ -1,14 +1,15 @@
 from pathlib import Path
 from typing import DefaultDict, List, NamedTuple, Optional, Tuple
 
+import asyncio
 import collections
 import hashlib
 import itertools
-import json
 import os
 import re
 import urllib.parse
 
+from .. import fastjson
 from ..electron import ElectronBinaryManager
 from ..integrity import Integrity
 from ..manifest import ManifestGenerator
@@ -259,7 +260,7 @@ class SpecialSourceProvider:
         if self.nwjs_version:
             version = self.nwjs_version
         else:
-            versions_json = json.loads(
+            versions_json = fastjson.loads(
                 await Requests.instance.read_all(
                     'https://nwjs.io/versions.json', cachable=False
                 )
@@ -275,7 +276,7 @@ class SpecialSourceProvider:
             _NPM_MIRROR,
             f'{package.name}@{package.version}/script/embedded-git.json',
         )
-        dl_json = json.loads(
+        dl_json = fastjson.loads(
             await Requests.instance.read_all(dl_json_url, cachable=True)
         )
         dugite_arch_map = {
@@ -330,7 +331,7 @@ class SpecialSourceProvider:
             browsers_json_url = base_url + 'packages/playwright-core/browsers.json'
         else:
             browsers_json_url = base_url + 'browsers.json'
-        browsers_json = json.loads(
+        browsers_json = fastjson.loads(
             await Requests.instance.read_all(browsers_json_url, cachable=True)
         )
         for browser in browsers_json['browsers']:
@@ -399,7 +400,7 @@ class SpecialSourceProvider:
         for flatpak_arch, new_pkg_name, old_pkg_name in pkg_names:
             pkg_name = new_pkg_name if pkg_name_is_scoped else old_pkg_name
             data_url = f'https://registry.npmjs.org/{pkg_name}/{package.version}'
-            registry_data = json.loads(await Requests.instance.read_all(data_url))
+            registry_data = fastjson.loads(await Requests.instance.read_all(data_url))
 
             dl_url = registry_data['dist']['tarball']
             integrity = Integrity.parse(registry_data['dist']['integrity'])
@@ -461,9 +462,13 @@ class SpecialSourceProvider:
             return
 
         if package.name == 'electron':
-            await self._handle_electron(package)
             if self.electron_node_headers:
-                await self._handle_electron_headers(package)
+                await asyncio.gather(
+                    self._handle_electron(package),
+                    self._handle_electron_headers(package),
+                )
+            else:
+                await self._handle_electron(package)
         elif package.name == 'electron-chromedriver':
             await self._handle_electron_chromedriver(package)
         elif package.name == 'chromedriver':
@@ -1,12 +1,16 @@
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+from typing import Any, Dict, Iterator, List, Optional, Type
 
+import asyncio
 import os
 import re
 import shlex
+import sys
 import types
 import urllib.parse
 
+from .. import fastjson
+from ..cache import Cache
 from ..integrity import Integrity
 from ..manifest import ManifestGenerator
 from ..package import GitSource, LocalSource, Package, PackageSource, ResolvedSource
@@ -14,58 +18,88 @@ from . import LockfileProvider, ModuleProvider, ProviderFactory, RCFileProvider
 from .npm import NpmRCFileProvider
 from .special import SpecialSourceProvider
 
-GIT_URL_PATTERNS = [
-    re.compile(r'^git:'),
-    re.compile(r'^git\+.+:'),
-    re.compile(r'^ssh:'),
-    re.compile(r'^https?:.+\.git$'),
-    re.compile(r'^https?:.+\.git#.+'),
-]
+GIT_URL_RE = re.compile(r'^(?:git:|git\+.+:|ssh:|https?:.+\.git(?:$|#.+))')
 
 GIT_URL_HOSTS = ['github.com', 'gitlab.com', 'bitbucket.com', 'bitbucket.org']
 
 
 class YarnLockfileProvider(LockfileProvider):
     _LOCAL_PKG_RE = re.compile(r'^(?:file|link):')
+    # A key and a value, each either bare or double quoted (without escapes).
+    _KEY_VALUE_RE = re.compile(
+        r'^(?:"([^"\\]*)"|([^\s"\'\\]+))\s+(?:"([^"\\]*)"|([^\s"\'\\]+))$'
+    )
 
     @staticmethod
     def is_git_version(version: str) -> bool:
-        for pattern in GIT_URL_PATTERNS:
-            if pattern.match(version):
-                return True
+        if GIT_URL_RE.match(version):
+            return True
+        # Most versions are registry tarball URLs, so only bother parsing the URL if
+        # one of the hosts appears in it at all.
+        if '//' not in version or not any(host in version for host in GIT_URL_HOSTS):
+            return False
         url = urllib.parse.urlparse(version)
         if url.netloc in GIT_URL_HOSTS:
             return len([p for p in url.path.split('/') if p]) == 2
         return False
 
     def parse_lockfile(self, lockfile: Path) -> Dict[str, Any]:
-        def _iter_lines() -> Iterator[Tuple[int, str]]:
-            indent = '  '
-            for line in lockfile.open():
-                level = 0
-                while line.startswith(indent):
-                    level += 1
-                    line = line[len(indent) :]
-                yield level, line.strip()
+        # Lockfiles rarely change between runs, and loading the parsed result back
+        # as JSON is much faster than parsing the lockfile again.
+        stat = lockfile.stat()
+        bucket = Cache.instance.get(
+            f'yarn-lockfile:{lockfile.resolve()}:{stat.st_mtime_ns}:{stat.st_size}'
+        )
+
+        bucket_reader = bucket.open_read()
+        if bucket_reader is not None:
+            with bucket_reader:
+                data: Dict[str, Any] = fastjson.loads(bucket_reader.read_all())
+                return data
+
+        root_entry = self._parse_lockfile(lockfile)
+
+        with bucket.open_write() as bucket_writer:
+            bucket_writer.write(fastjson.dumps(root_entry))
+
+        return root_entry
+
+    def _parse_lockfile(self, lockfile: Path) -> Dict[str, Any]:
+        with lockfile.open() as fp:
+            # Universal newlines already turned every line ending into '\n'.
+            lines = fp.read().split('\n')
 
         root_entry: Dict[str, Any] = {}
         parent_entries = [root_entry]
-
-        for level, line in _iter_lines():
-            if line.startswith('#') or not line:
+        key_value_match = self._KEY_VALUE_RE.match
+
+        for line in lines:
+            # Each level is indented by two spaces; count them all at once instead of
+            # stripping the indent one level at a time.
+            unindented = line.lstrip(' ')
+            level = (len(line) - len(unindented)) // 2
+            line = unindented.strip()
+            if not line or line[0] == '#':
                 continue
             assert level <= len(parent_entries) - 1
-            parent_entries = parent_entries[: level + 1]
+            # Drop the entries of any levels we just left, without copying the list.
+            del parent_entries[level + 1 :]
             if line.endswith(':'):
                 key = line[:-1]
                 child_entry = parent_entries[-1][key] = {}
                 parent_entries.append(child_entry)
             else:
-                # NOTE shlex.split is handy, but slow;
-                # to speed up parsing we can use something less robust, e.g.
-                # _key, _value = line.split(' ', 1)
-                # parent_entries[-1][self.unquote(_key)] = self.unquote(_value)
-                key, value = shlex.split(line)
+                # NOTE shlex.split is handy, but slow, so only fall back to it for
+                # the rare lines the regex can't handle (e.g. escaped quotes).
+                match = key_value_match(line)
+                if match is not None:
+                    quoted_key, key, quoted_value, value = match.groups()
+                    if key is None:
+                        key = quoted_key
+                    if value is None:
+                        value = quoted_value
+                else:
+                    key, value = shlex.split(line)
                 parent_entries[-1][key] = value
 
         return root_entry
@@ -86,20 +120,26 @@ class YarnLockfileProvider(LockfileProvider):
         name, version_constraint = name.rsplit('@', 1)
 
         source: PackageSource
-        if self._LOCAL_PKG_RE.match(version_constraint):
-            source = LocalSource(path=self._LOCAL_PKG_RE.sub('', version_constraint))
+        local_match = self._LOCAL_PKG_RE.match(version_constraint)
+        if local_match is not None:
+            source = LocalSource(path=version_constraint[local_match.end() :])
         else:
-            if self.is_git_version(entry['resolved']):
-                source = self.parse_git_source(version=entry['resolved'])
+            resolved = entry['resolved']
+            if self.is_git_version(resolved):
+                source = self.parse_git_source(version=resolved)
             else:
-                if 'integrity' in entry:
-                    integrity = Integrity.parse(entry['integrity'])
+                raw_integrity = entry.get('integrity')
+                if raw_integrity is not None:
+                    integrity = Integrity.parse(raw_integrity)
                 else:
                     integrity = None
-                source = ResolvedSource(resolved=entry['resolved'], integrity=integrity)
+                source = ResolvedSource(resolved=resolved, integrity=integrity)
 
         return Package(
-            name=name, version=entry['version'], source=source, lockfile=lockfile
+            name=sys.intern(name),
+            version=entry['version'],
+            source=source,
+            lockfile=lockfile,
         )
 
     def process_lockfile(self, lockfile: Path) -> Iterator[Package]:
@@ -121,6 +161,7 @@ class YarnModuleProvider(ModuleProvider):
         self.gen = gen
         self.special_source_provider = special
         self.mirror_dir = self.gen.data_root / 'yarn-mirror'
+        self.remote_integrities: Dict[str, asyncio.Task[Integrity]] = {}
 
     def __exit__(
         self,
@@ -130,11 +171,24 @@ class YarnModuleProvider(ModuleProvider):
     ) -> None:
         pass
 
+    async def _retrieve_integrity(self, source: ResolvedSource) -> Integrity:
+        if source.integrity is not None:
+            return source.integrity
+
+        # The same tarball can be resolved by multiple lockfiles, so make sure it's only
+        # downloaded and hashed once.
+        task = self.remote_integrities.get(source.resolved)
+        if task is None:
+            task = asyncio.create_task(source.retrieve_integrity())
+            self.remote_integrities[source.resolved] = task
+
+        return await task
+
     async def generate_package(self, package: Package) -> None:
         source = package.source
 
         if isinstance(source, ResolvedSource):
-            integrity = await source.retrieve_integrity()
+            integrity = await self._retrieve_integrity(source)
             url_parts = urllib.parse.urlparse(source.resolved)
             match = self._PACKAGE_TARBALL_URL_RE.search(url_parts.path)
             if match is not None:
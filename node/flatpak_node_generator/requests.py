@@ -1,12 +1,15 @@
-from typing import AsyncIterator, ClassVar
+from typing import AsyncIterator, ClassVar, Dict, Optional
 
+import asyncio
 import contextlib
 
 import aiohttp
 
 from .cache import Cache
 
-DEFAULT_PART_SIZE = 4096
+# Parts are hashed and written to the cache as they come in, so larger ones mean far
+# fewer round trips through the event loop for big tarballs.
+DEFAULT_PART_SIZE = 64 * 1024
 
 
 class Requests:
@@ -14,31 +17,117 @@ class Requests:
 
     DEFAULT_RETRIES = 5
     retries: ClassVar[int] = DEFAULT_RETRIES
-
-    def __get_cache_bucket(self, cachable: bool, url: str) -> Cache.BucketRef:
-        return Cache.get_working_instance_if(cachable).get(f'requests:{url}')
+    # Retries back off exponentially from the base delay, up to the max delay, to
+    # give rate-limited or overloaded servers a chance to recover.
+    RETRY_BASE_DELAY = 0.1
+    RETRY_MAX_DELAY = 5.0
+
+    # Most requests go to a handful of registry & CDN hosts, so keep per-host
+    # concurrency bounded to avoid tripping rate limits, and cache DNS lookups.
+    # The total limit is set from --max-parallel, so that every package being
+    # processed can have a couple of requests in flight without waiting on the
+    # connector.
+    connection_limit: ClassVar[int] = 128
+    CONNECTION_LIMIT_PER_HOST = 16
+    DNS_CACHE_TTL = 600
+    # Only bound connecting & idle reads, so large downloads can take as long as
+    # they need but stuck sockets don't stall the whole run.
+    TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+
+    def __init__(self) -> None:
+        # One session is shared by all requests, so that connections to the same
+        # hosts are kept alive and reused instead of doing a new handshake per URL.
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __get_cache_bucket(
+        self, cachable: bool, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> Cache.BucketRef:
+        key = f'requests:{url}'
+        if headers:
+            # Different headers can get a different response for the same URL.
+            key += ':' + ':'.join(f'{k}={v}' for k, v in sorted(headers.items()))
+        return Cache.get_working_instance_if(cachable).get(key)
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            limit_per_host=self.CONNECTION_LIMIT_PER_HOST,
+            ttl_dns_cache=self.DNS_CACHE_TTL,
+        )
+        return aiohttp.ClientSession(
+            raise_for_status=True, connector=connector, timeout=self.TIMEOUT
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Sessions are bound to the event loop they were created in.
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop != loop:
+            self._session = self._create_session()
+            self._session_loop = loop
+
+        return self._session
+
+    @staticmethod
+    def _should_retry(ex: Exception) -> bool:
+        if isinstance(ex, aiohttp.ClientResponseError):
+            # Client errors won't go away by asking again, unless we were told to
+            # slow down.
+            return ex.status == 429 or not 400 <= ex.status < 500
+
+        # Anything else (e.g. failing to write to the cache) isn't a network error.
+        return isinstance(ex, (aiohttp.ClientError, asyncio.TimeoutError))
+
+    async def _wait_before_retry(self, attempt: int) -> None:
+        await asyncio.sleep(
+            min(self.RETRY_BASE_DELAY * 2 ** (attempt - 1), self.RETRY_MAX_DELAY)
+        )
+
+    async def close(self) -> None:
+        """Closes the shared session, if one was opened."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._session_loop = None
 
     @contextlib.asynccontextmanager
-    async def _open_stream(self, url: str) -> AsyncIterator[aiohttp.StreamReader]:
-        async with aiohttp.ClientSession(raise_for_status=True) as session:
-            async with session.get(url) as response:
-                yield response.content
+    async def _open_stream(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[aiohttp.StreamReader]:
+        async with self._get_session().get(url, headers=headers) as response:
+            yield response.content
 
     async def _read_parts(
         self, url: str, size: int = DEFAULT_PART_SIZE
     ) -> AsyncIterator[bytes]:
         async with self._open_stream(url) as stream:
-            while True:
-                data = await stream.read(size)
-                if not data:
-                    return
-
+            async for data in stream.iter_chunked(size):
                 yield data
 
-    async def _read_all(self, url: str) -> bytes:
-        async with self._open_stream(url) as stream:
+    async def _read_all(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> bytes:
+        async with self._open_stream(url, headers) as stream:
             return await stream.read()
 
+    async def _read_content_length(self, url: str) -> Optional[int]:
+        session = self._get_session()
+        try:
+            async with session.head(url, allow_redirects=True) as response:
+                encoding = response.headers.get(aiohttp.hdrs.CONTENT_ENCODING)
+                if encoding not in (None, 'identity'):
+                    # The length would be of the encoded body, not the file.
+                    return None
+
+                return response.content_length
+        except aiohttp.ClientResponseError as ex:
+            # Not every server supports HEAD requests. Any other error is left to the
+            # caller's retry handling.
+            if ex.status in (405, 501):
+                return None
+
+            raise
+
     async def read_parts(
         self, url: str, *, cachable: bool = False, size: int = DEFAULT_PART_SIZE
     ) -> AsyncIterator[bytes]:
@@ -46,40 +135,76 @@ class Requests:
 
         bucket_reader = bucket.open_read()
         if bucket_reader is not None:
-            for part in bucket_reader.read_parts(size):
-                yield part
+            # Cached files can be large, so read them in a worker thread instead of
+            # blocking every other download while doing so. One read for the whole
+            # file avoids a thread handoff per part.
+            loop = asyncio.get_running_loop()
+            with bucket_reader:
+                data = await loop.run_in_executor(None, bucket_reader.read_all)
+
+            for start in range(0, len(data), size):
+                yield data[start : start + size]
 
             return
 
         for i in range(1, Requests.retries + 1):
             try:
+                # A failed attempt cancels the bucket writer, so nothing partial
+                # is left behind in the cache.
                 with bucket.open_write() as bucket_writer:
                     async for part in self._read_parts(url, size):
                         bucket_writer.write(part)
                         yield part
 
                 return
-            except Exception:
-                if i == Requests.retries:
+            except Exception as ex:
+                if i == Requests.retries or not self._should_retry(ex):
                     raise
 
-    async def read_all(self, url: str, *, cachable: bool = False) -> bytes:
-        bucket = self.__get_cache_bucket(cachable, url)
+            await self._wait_before_retry(i)
+
+    async def read_all(
+        self,
+        url: str,
+        *,
+        cachable: bool = False,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> bytes:
+        bucket = self.__get_cache_bucket(cachable, url, headers)
 
         bucket_reader = bucket.open_read()
         if bucket_reader is not None:
-            return bucket_reader.read_all()
+            with bucket_reader:
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, bucket_reader.read_all
+                )
 
         for i in range(1, Requests.retries + 1):
             try:
                 with bucket.open_write() as bucket_writer:
-                    data = await self._read_all(url)
+                    data = await self._read_all(url, headers)
                     bucket_writer.write(data)
                     return data
-            except Exception:
-                if i == Requests.retries:
+            except Exception as ex:
+                if i == Requests.retries or not self._should_retry(ex):
                     raise
 
+            await self._wait_before_retry(i)
+
+        assert False
+
+    async def read_content_length(self, url: str) -> Optional[int]:
+        """Returns the size of the file at url if the server advertises it, without
+        downloading the file itself."""
+        for i in range(1, Requests.retries + 1):
+            try:
+                return await self._read_content_length(url)
+            except Exception as ex:
+                if i == Requests.retries or not self._should_retry(ex):
+                    raise
+
+            await self._wait_before_retry(i)
+
         assert False
 
 
@@ -89,8 +214,13 @@ class StubRequests(Requests):
     ) -> AsyncIterator[bytes]:
         yield b''
 
-    async def _read_all(self, url: str) -> bytes:
+    async def _read_all(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> bytes:
         return b''
 
+    async def _read_content_length(self, url: str) -> Optional[int]:
+        return None
+
 
 Requests.instance = Requests()
@@ -1,11 +1,16 @@
 from typing import Any, NamedTuple
 
-import json
+import asyncio
 
+from . import fastjson
 from .cache import Cache
 from .integrity import Integrity, IntegrityBuilder
 from .requests import Requests
 
+# Downloaded data is hashed in blocks of this size in a worker thread, so that hashing
+# large files (e.g. Electron binaries) doesn't stall the event loop.
+_HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
 
 class RemoteUrlMetadata(NamedTuple):
     integrity: Integrity
@@ -32,20 +37,29 @@ class RemoteUrlMetadata(NamedTuple):
 
         bucket_reader = bucket.open_read()
         if bucket_reader is not None:
-            data = json.loads(bucket_reader.read_all())
+            data = fastjson.loads(bucket_reader.read_all())
             return RemoteUrlMetadata.from_json_object(data)
 
         builder = IntegrityBuilder(integrity_algorithm)
         size = 0
+        block = bytearray()
+        loop = asyncio.get_running_loop()
 
         async for part in Requests.instance.read_parts(url, cachable=False):
-            builder.update(part)
+            block += part
             size += len(part)
 
+            if len(block) >= _HASH_BLOCK_SIZE:
+                await loop.run_in_executor(None, builder.update, bytes(block))
+                block.clear()
+
+        if block:
+            await loop.run_in_executor(None, builder.update, bytes(block))
+
         metadata = RemoteUrlMetadata(integrity=builder.build(), size=size)
 
         with bucket.open_write() as bucket_writer:
-            bucket_writer.write(json.dumps(metadata.to_json_object()).encode('ascii'))
+            bucket_writer.write(fastjson.dumps(metadata.to_json_object()))
 
         return metadata
 
@@ -57,9 +71,11 @@ class RemoteUrlMetadata(NamedTuple):
         if bucket_reader is not None:
             return int(bucket_reader.read_all())
 
-        size = 0
-        async for part in Requests.instance.read_parts(url, cachable=False):
-            size += len(part)
+        size = await Requests.instance.read_content_length(url)
+        if size is None:
+            size = 0
+            async for part in Requests.instance.read_parts(url, cachable=False):
+                size += len(part)
 
         with bucket.open_write() as bucket_writer:
             bucket_writer.write(str(size).encode('ascii'))
@@ -1,6 +1,16 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import enum
 import json
@@ -38,6 +48,15 @@ def fs_cache(tmp_path_factory: pytest.TempPathFactory) -> Iterator[None]:
         Cache.instance = NullCache()
 
 
+@pytest.fixture(autouse=True)
+async def requests_session() -> AsyncIterator[None]:
+    # The shared session is bound to each test's event loop.
+    try:
+        yield
+    finally:
+        await Requests.instance.close()
+
+
 @dataclass
 class RequestsController:
     server: HTTPServer
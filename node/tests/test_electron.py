@@ -1,5 +1,7 @@
 from typing import List
 
+import pytest
+
 from conftest import RequestsController
 from flatpak_node_generator.electron import ElectronBinaryManager
 from flatpak_node_generator.integrity import Integrity
@@ -138,3 +140,14 @@ async def test_ffmpeg_binaries(requests: RequestsController) -> None:
             arch=ElectronBinaryManager.Arch(electron='x64', flatpak='x86_64'),
         ),
     ]
+
+
+
+async def test_missing_binaries(requests: RequestsController) -> None:
+    _expect_integrity_request(requests)
+    manager = await ElectronBinaryManager.for_version(
+        VERSION, base_url=requests.url.rstrip('/')
+    )
+
+    with pytest.raises(KeyError, match='chromedriver-v18.0.0-linux-arm64.zip'):
+        _list_binaries(manager, 'chromedriver')
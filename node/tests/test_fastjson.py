@@ -0,0 +1,29 @@
+import json
+
+from flatpak_node_generator import fastjson
+
+_DATA = {
+    'name': 'pkg',
+    'versions': {'1.0.0': {'dist': {'tarball': 'https://example.com/ü.tgz'}}},
+    'list': (1, 2, 3),
+    'flag': True,
+    'none': None,
+}
+
+
+def test_dumps_compact() -> None:
+    assert (
+        fastjson.dumps(_DATA)
+        == json.dumps(_DATA, ensure_ascii=False, separators=(',', ':')).encode()
+    )
+
+
+def test_dumps_indented() -> None:
+    assert (
+        fastjson.dumps_indented(_DATA)
+        == json.dumps(_DATA, ensure_ascii=False, indent=fastjson.INDENT).encode()
+    )
+
+
+def test_roundtrip() -> None:
+    assert fastjson.loads(fastjson.dumps(_DATA)) == json.loads(json.dumps(_DATA))
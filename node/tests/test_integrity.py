@@ -32,3 +32,8 @@ def test_parse() -> None:
     integrity = Integrity.parse(f'sha256-{TEST_SHA256_B64}')
     assert integrity.algorithm == 'sha256'
     assert integrity.digest == TEST_SHA256
+
+
+def test_parse_cached() -> None:
+    value = f'sha256-{TEST_SHA256_B64}'
+    assert Integrity.parse(value) is Integrity.parse(value)
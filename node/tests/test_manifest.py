@@ -2,9 +2,12 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import json
 import subprocess
 import urllib.parse
 
+import pytest
+
 from conftest import FlatpakBuilder, RequestsController
 from flatpak_node_generator.integrity import Integrity
 from flatpak_node_generator.manifest import ManifestGenerator
@@ -137,3 +140,54 @@ def test_ordering() -> None:
     assert next(sources)['url'] == URL_1
     assert next(sources)['url'] == URL_2
     assert next(sources)['url'] == URL_3
+
+
+def test_deduplication() -> None:
+    with ManifestGenerator() as gen:
+        gen.add_git_source('abc', commit='123')
+        gen.add_git_source('abc', commit='123')
+        gen.add_git_source('abc', commit='456')
+
+    assert gen.source_count == 2
+    assert [source['commit'] for source in gen.ordered_sources()] == ['123', '456']
+
+
+def test_deduplication_ignores_key_order() -> None:
+    with ManifestGenerator() as gen:
+        gen._add_source({'type': 'git', 'url': 'abc', 'commit': '123'})
+        gen._add_source({'type': 'git', 'commit': '123', 'url': 'abc'})
+
+    assert gen.source_count == 1
+
+
+def test_write_sources(tmp_path: Path) -> None:
+    with ManifestGenerator() as gen:
+        for i in range(10):
+            gen.add_url_source(f'https://example.com/{i}', Integrity.generate(str(i)))
+
+    output = tmp_path / 'generated-sources.json'
+    assert gen.write_sources(output) == [output]
+    assert output.read_text() == json.dumps(
+        list(gen.ordered_sources()), indent=ManifestGenerator.JSON_INDENT
+    )
+
+
+def test_write_sources_split(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(ManifestGenerator, 'MAX_GITHUB_SIZE', 1000)
+
+    with ManifestGenerator() as gen:
+        for i in range(10):
+            gen.add_url_source(f'https://example.com/{i}', Integrity.generate(str(i)))
+
+    output = tmp_path / 'generated-sources.json'
+    paths = gen.write_sources(output, split=True)
+
+    assert len(paths) > 1
+    assert paths[0] == tmp_path / 'generated-sources.0.json'
+
+    written_sources = []
+    for path in paths:
+        assert path.stat().st_size < ManifestGenerator.MAX_GITHUB_SIZE
+        written_sources.extend(json.loads(path.read_text()))
+
+    assert written_sources == list(gen.ordered_sources())
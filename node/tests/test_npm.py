@@ -0,0 +1,35 @@
+from conftest import ProviderFactorySpec
+from flatpak_node_generator.integrity import Integrity
+from flatpak_node_generator.manifest import ManifestGenerator
+from flatpak_node_generator.providers.npm import NpmModuleProvider
+from flatpak_node_generator.providers.special import SpecialSourceProvider
+from flatpak_node_generator.url_metadata import RemoteUrlMetadata
+
+
+def test_index_entry(npm_provider_factory_spec: ProviderFactorySpec) -> None:
+    URL = 'https://registry.npmjs.org/@scope%2fpkg/-/pkg-1.0.0.tgz?q="ü"'
+    HEADERS = {'accept': 'application/json'}
+
+    gen = ManifestGenerator()
+    factory, _ = npm_provider_factory_spec.create_factory('local', node_version=16)
+    module_provider = factory.create_module_provider(
+        gen, SpecialSourceProvider(gen, npm_provider_factory_spec.special)
+    )
+    assert isinstance(module_provider, NpmModuleProvider)
+
+    metadata = RemoteUrlMetadata(integrity=Integrity.generate('abc'), size=3)
+
+    path, entry = module_provider._render_index_entry(URL, metadata, HEADERS)
+
+    key = f'make-fetch-happen:request-cache:{URL}'
+    assert path == module_provider.get_cacache_index_path(Integrity.generate(key))
+
+    assert entry == (
+        'fc591c20cea14116b74fcd17f0fdc556f67c4bd3\t'
+        '{"key":"make-fetch-happen:request-cache:'
+        'https://registry.npmjs.org/@scope%2fpkg/-/pkg-1.0.0.tgz?q=\\"ü\\"",'
+        '"integrity":"sha256-ungWv48Bz+pBQUDeXa4iI7ADYaOWF3qctBD/YfIAFa0=",'
+        '"time":0,"size":3,"metadata":{'
+        '"url":"https://registry.npmjs.org/@scope%2fpkg/-/pkg-1.0.0.tgz?q=\\"ü\\"",'
+        '"reqHeaders":{"accept":"application/json"},"resHeaders":{}}}'
+    )
@@ -33,3 +33,11 @@ def test_semver_cmp() -> None:
     assert SemVer.parse('1.0.0-alpha.x') < SemVer.parse('1.0.0-beta')
     assert SemVer.parse('1.0.0-alpha.1') < SemVer.parse('1.0.0-alpha.1.1')
     assert SemVer.parse('1.0.0-alpha+build1') == SemVer.parse('1.0.0-alpha+build2')
+
+    assert not SemVer.parse('1.0.0-alpha.2') < SemVer.parse('1.0.0-alpha.1.1')
+    assert not SemVer.parse('1.0.0-beta.1') < SemVer.parse('1.0.0-alpha.2')
+    assert not SemVer.parse('1.0.0-alpha.x') < SemVer.parse('1.0.0-alpha.1')
+
+
+def test_semver_parsing_cached() -> None:
+    assert SemVer.parse('1.2.3-beta.1') is SemVer.parse('1.2.3-beta.1')
@@ -35,6 +35,18 @@ async def test_read_all(requests: RequestsController) -> None:
     assert (await Requests.instance.read_all(requests.url_for(_HELLO))) == _DATA2
 
 
+async def test_read_all_headers(requests: RequestsController) -> None:
+    requests.server.expect_oneshot_request(
+        _HELLO, 'GET', headers={'Accept': 'application/json'}
+    ).respond_with_data(_DATA)
+
+    assert (
+        await Requests.instance.read_all(
+            requests.url_for(_HELLO), headers={'accept': 'application/json'}
+        )
+    ) == _DATA
+
+
 async def test_read_all_retries(requests: RequestsController) -> None:
     assert Requests.retries == 3
 
@@ -52,6 +64,15 @@ async def test_read_all_retries(requests: RequestsController) -> None:
     assert (await Requests.instance.read_all(requests.url_for(_HELLO))) == _DATA
 
 
+async def test_read_all_no_retry_on_client_error(
+    requests: RequestsController,
+) -> None:
+    _expect_single_hello(requests).respond_with_data(status=404)
+
+    with pytest.raises(Exception, match=r'404'):
+        await Requests.instance.read_all(requests.url_for(_HELLO))
+
+
 async def test_read_all_cached(requests: RequestsController) -> None:
     _expect_single_hello(requests).respond_with_data(_DATA)
 
@@ -121,3 +142,25 @@ async def test_read_parts_cached(requests: RequestsController) -> None:
             )
         )
     ) == _DATA
+
+
+async def test_read_content_length(requests: RequestsController) -> None:
+    requests.server.expect_oneshot_request(_HELLO, 'HEAD').respond_with_data(_DATA)
+    assert (
+        await Requests.instance.read_content_length(requests.url_for(_HELLO))
+    ) == len(_DATA)
+
+
+async def test_read_content_length_unsupported(requests: RequestsController) -> None:
+    requests.server.expect_oneshot_request(_HELLO, 'HEAD').respond_with_data(status=405)
+    assert (
+        await Requests.instance.read_content_length(requests.url_for(_HELLO))
+    ) is None
+
+
+async def test_read_content_length_retries(requests: RequestsController) -> None:
+    requests.server.expect_oneshot_request(_HELLO, 'HEAD').respond_with_data(status=500)
+    requests.server.expect_oneshot_request(_HELLO, 'HEAD').respond_with_data(_DATA)
+    assert (
+        await Requests.instance.read_content_length(requests.url_for(_HELLO))
+    ) == len(_DATA)
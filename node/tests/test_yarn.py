@@ -1,8 +1,14 @@
 from pathlib import Path
 
-from conftest import ProviderFactorySpec
+import asyncio
+
+import pytest
+
+from conftest import ProviderFactorySpec, RequestsController
 from flatpak_node_generator.integrity import Integrity
+from flatpak_node_generator.manifest import ManifestGenerator
 from flatpak_node_generator.package import GitSource, Package, ResolvedSource
+from flatpak_node_generator.providers.special import SpecialSourceProvider
 from flatpak_node_generator.providers.yarn import YarnLockfileProvider
 
 TEST_LOCKFILE = """
@@ -88,3 +94,58 @@ def test_lockfile_parsing(tmp_path: Path) -> None:
             ),
         ),
     ]
+
+
+def test_lockfile_parsing_cached(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    lockfile_provider = YarnLockfileProvider()
+
+    yarn_lock = tmp_path / 'yarn.lock'
+    yarn_lock.write_text(TEST_LOCKFILE)
+
+    parsed = lockfile_provider.parse_lockfile(yarn_lock)
+
+    def fail(self: YarnLockfileProvider, lockfile: Path) -> None:
+        raise AssertionError('lockfile parsed again')
+
+    monkeypatch.setattr(YarnLockfileProvider, '_parse_lockfile', fail)
+    assert lockfile_provider.parse_lockfile(yarn_lock) == parsed
+
+    yarn_lock.write_text(TEST_LOCKFILE + '\n')
+    with pytest.raises(AssertionError, match='parsed again'):
+        lockfile_provider.parse_lockfile(yarn_lock)
+
+
+async def test_remote_integrity_shared(
+    requests: RequestsController,
+    yarn_provider_factory_spec: ProviderFactorySpec,
+    tmp_path: Path,
+) -> None:
+    DATA = 'abc'
+
+    requests.server.expect_oneshot_request('/name-1.0.0.tgz', 'GET').respond_with_data(
+        DATA
+    )
+
+    source = ResolvedSource(resolved=requests.url_for('name-1.0.0.tgz'), integrity=None)
+    packages = [
+        Package(
+            name='name',
+            version='1.0.0',
+            source=source,
+            lockfile=tmp_path / project / 'yarn.lock',
+        )
+        for project in ('a', 'b')
+    ]
+
+    gen = ManifestGenerator()
+    factory, _ = yarn_provider_factory_spec.create_factory('local', node_version=16)
+    special = SpecialSourceProvider(gen, yarn_provider_factory_spec.special)
+
+    with factory.create_module_provider(gen, special) as module_provider:
+        await asyncio.gather(*map(module_provider.generate_package, packages))
+
+    assert [source['sha256'] for source in gen.ordered_sources()] == [
+        Integrity.generate(DATA).digest
+    ]
@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
 
 import argparse
+import concurrent.futures
 import sys
 import json
 import base64
-import binascii
 import urllib.request
 import urllib.parse
 import re
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 electron_arches = {
     "ia32": "i386",
     "x64": "x86_64",
@@ -17,51 +22,128 @@ electron_arches = {
     "arm64": "aarch64",
 }
 
+commit_re = re.compile(r'#[0-9a-fA-F]*')
+domain_re = re.compile(r'\w+\.\w+\/')
+name_part_re = re.compile(r'[0-9a-zA-Z_-]+')
+# "<sha256> *<filename>" lines, the "*" (binary mode marker) being optional.
+shasum_re = re.compile(r'^([0-9a-fA-F]+)[ \t]+\*?(\S+)[ \t\r]*$', re.MULTILINE)
+
+# Shorthand git URL prefixes and the servers they refer to.
+git_shorthand_servers = (
+    ("github:", "https://github.com/"),
+    ("gitlab:", "https://gitlab.com/"),
+    ("bitbucket:", "https://bitbucket.org/"),
+)
+
+# Electron version -> {filename: sha256}, so each SHASUMS256.txt is only fetched once.
+electron_shasums = {}
+
+def getElectronReleaseUrl(electron_version):
+    return "https://github.com/electron/electron/releases/download/v" + electron_version + "/"
+
+def loadElectronShasumsData(electron_version):
+    # Released checksums never change, so keep them on disk across runs too.
+    cache_dir = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "flatpak-npm-generator")
+    cache_path = os.path.join(cache_dir, "SHASUMS256-" + electron_version + ".txt")
+    try:
+        with open(cache_path, 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    shasums_url = getElectronReleaseUrl(electron_version) + "SHASUMS256.txt"
+    f = urllib.request.urlopen(shasums_url)
+    shasums_data = f.read().decode("utf8")
+
+    # Write to a temporary file first, so an interrupted run can't leave a truncated file behind.
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        f.write(shasums_data)
+    os.replace(temp_path, cache_path)
+
+    return shasums_data
+
+def getElectronShasums(electron_version):
+    if electron_version not in electron_shasums:
+        shasums_data = loadElectronShasumsData(electron_version)
+        electron_shasums[electron_version] = {name: sha256 for sha256, name in shasum_re.findall(shasums_data)}
+
+    return electron_shasums[electron_version]
+
+# orjson is optional, but much faster on large lockfiles. Both paths produce the same output.
+def loadJson(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumpJson(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, indent=2, sort_keys=True, ensure_ascii=False).encode("utf8")
+
+def writeJsonList(items, f):
+    # Write the list one entry at a time, so the whole output never has to be in memory at once.
+    if not items:
+        f.write(b"[]")
+        return
+
+    f.write(b"[\n")
+    for i, item in enumerate(items):
+        if i > 0:
+            f.write(b",\n")
+        # Dump each entry inside a list and strip the brackets, so that it's
+        # indented exactly like it would be as part of the whole list.
+        f.write(dumpJson([item])[len(b"[\n"):-len(b"\n]")])
+    f.write(b"\n]")
+
+def getElectronVersion(url):
+    # Almost no packages are Electron, so rule them out before splitting the URL.
+    if "electron-" not in url:
+        return None
+    tarname = url.rpartition("/")[2]
+    if tarname.startswith("electron-") and tarname[len("electron-"):len("electron-") + 1].isdigit() and tarname.endswith(".tgz"):
+        return tarname[len("electron-"):-len(".tgz")]
+    return None
+
+def prefetchElectronShasums(trees):
+    electron_versions = set()
+    for modules in trees:
+        for module, _ in modules:
+            electron_version = getElectronVersion(module.get("resolved") or module.get("version", ""))
+            if electron_version is not None:
+                electron_versions.add(electron_version)
+
+    # The downloads don't depend on each other, so do them all at once.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(getElectronShasums, electron_versions))
+
 def isGitUrl(url):
     return url.startswith("github:") or url.startswith("gitlab:") or url.startswith("bitbucket:") or url.startswith("git")
 
 def getPathandCommitInfo(strippedUrl):
     parsedUrl = {}
-    parsedUrl["path"] = re.split(r'#[0-9a-fA-F]*', strippedUrl)[0]
-    parsedUrl["commit"] = re.findall(r'#[0-9a-fA-F]*', strippedUrl)[0][1:]
-    parsedUrl["name"] = "-".join(re.findall(r'[0-9a-zA-Z_-]+',parsedUrl["path"]))
+    parsedUrl["path"] = commit_re.split(strippedUrl, 1)[0]
+    parsedUrl["commit"] = commit_re.search(strippedUrl).group()[1:]
+    parsedUrl["name"] = "-".join(name_part_re.findall(parsedUrl["path"]))
     return parsedUrl;
 
 def parseGitUrl(url):
-    if url.startswith("github:"):
-        prefixStrippedUrl = re.split("github:", url)[1]
-        parsedUrl = getPathandCommitInfo(prefixStrippedUrl)
-        parsedUrl["url"] = "https://github.com/" + parsedUrl["path"]
-        parsedUrl["sedCommand"] = (
-            "sed -r -i 's^\"github:" + parsedUrl["path"] +
-            "(#.*)?\"^\"git+file:/var/tmp/build-dir/npm-cache/git/" +
-            parsedUrl["name"] + "\\#" + parsedUrl["commit"] +
-            "\"^g' package.json")
-
-    elif url.startswith("gitlab:"):
-        prefixStrippedUrl = re.split("gitlab:", url)[1]
-        parsedUrl = getPathandCommitInfo(prefixStrippedUrl)
-        parsedUrl["url"] = "https://gitlab.com/" + parsedUrl["path"]
-        parsedUrl["sedCommand"] = (
-            "sed -r -i 's^\"gitlab:" + parsedUrl["path"] +
-            "(#.*)?\"^\"git+file:/var/tmp/build-dir/npm-cache/git/" +
-            parsedUrl["name"] + "\\#" + parsedUrl["commit"] +
-            "\"^g' package.json")
-
-    elif url.startswith("bitbucket:"):
-        prefixStrippedUrl = re.split("bitbucket:", url)[1]
-        parsedUrl = getPathandCommitInfo(prefixStrippedUrl)
-        parsedUrl["url"] = "https://bitbucket.org/" + parsedUrl["path"]
-        parsedUrl["sedCommand"] = (
-            "sed -r -i 's^\"bitbucket:" + parsedUrl["path"] +
-            "(#.*)?\"^\"git+file:/var/tmp/build-dir/npm-cache/git/" +
-            parsedUrl["name"] + "\\#" + parsedUrl["commit"] +
-            "\"^g' package.json")
-
-    elif url.startswith("git://"):
-        prefixStrippedUrl = re.split(r'\w+\.\w+\/',url)[1]
+    for prefix, server in git_shorthand_servers:
+        if url.startswith(prefix):
+            parsedUrl = getPathandCommitInfo(url[len(prefix):])
+            parsedUrl["url"] = server + parsedUrl["path"]
+            parsedUrl["sedCommand"] = (
+                "sed -r -i 's^\"" + prefix + parsedUrl["path"] +
+                "(#.*)?\"^\"git+file:/var/tmp/build-dir/npm-cache/git/" +
+                parsedUrl["name"] + "\\#" + parsedUrl["commit"] +
+                "\"^g' package.json")
+            return parsedUrl
+
+    if url.startswith("git://"):
+        prefixStrippedUrl = domain_re.split(url)[1]
         parsedUrl = getPathandCommitInfo(prefixStrippedUrl)
-        domain = re.findall(r'\w+\.\w+\/',url)[0]
+        domain = domain_re.search(url).group()
         parsedUrl["url"] = "git://" + domain + parsedUrl["path"]
         parsedUrl["sedCommand"] = (
             "sed -r -i 's^\"git://" + domain + parsedUrl["path"] +
@@ -70,9 +152,9 @@ def parseGitUrl(url):
             "\"^g' package.json")
 
     elif url.startswith("git+https://"):
-        prefixStrippedUrl = re.split(r'\w+\.\w+\/',url)[1]
+        prefixStrippedUrl = domain_re.split(url)[1]
         parsedUrl = getPathandCommitInfo(prefixStrippedUrl)
-        domain = re.findall(r'\w+\.\w+\/',url)[0]
+        domain = domain_re.search(url).group()
         parsedUrl["url"] = "https://" + domain + parsedUrl["path"]
         parsedUrl["sedCommand"] = (
             "sed -r -i 's^\"git+https://" + domain + parsedUrl["path"] +
@@ -81,9 +163,9 @@ def parseGitUrl(url):
             "\"^g' package.json")
 
     elif url.startswith("git+http://"):
-        prefixStrippedUrl = re.split(r'\w+\.\w+\/',url)[1]
+        prefixStrippedUrl = domain_re.split(url)[1]
         parsedUrl = getPathandCommitInfo(prefixStrippedUrl)
-        domain = re.findall(r'\w+\.\w+\/',url)[0]
+        domain = domain_re.search(url).group()
         parsedUrl["url"] = "http://" + domain + parsedUrl["path"]
         parsedUrl["sedCommand"] = (
             "sed -r -i 's^\"git+http://" + domain + parsedUrl["path"] +
@@ -99,46 +181,67 @@ def parseGitUrl(url):
 
     return parsedUrl
 
-def getModuleSources(module, name, seen=None, include_devel=True, npm3=False):
-    sources = []
-    patches = []
-    seen = seen or {}
-
+def addElectronSources(electron_version, sources):
+    shasums = getElectronShasums(electron_version)
+
+    release_url = getElectronReleaseUrl(electron_version)
+    mini_shasums = []
+    for arch, flatpak_arch in electron_arches.items():
+        basename = "electron-v" + electron_version + "-linux-" + arch + ".zip"
+        if not basename in shasums:
+            continue
+        source = {"type": "file",
+                  "only-arches": [flatpak_arch],
+                  "url": release_url + basename,
+                  "sha256": shasums[basename],
+                  "dest": "npm-cache"}
+        sources.append(source)
+        mini_shasums.append(shasums[basename] + " *" + basename + "\n")
+    source = {"type": "file",
+              "url": "data:" + urllib.parse.quote_from_bytes("".join(mini_shasums).encode("utf8")),
+              "dest": "npm-cache",
+              "dest-filename": "SHASUMS256.txt-" + electron_version}
+    sources.append(source)
+
+def addModuleSources(module, name, sources, patches, seen, include_devel, npm3):
     version = module.get("version", "")
+    resolved = module.get("resolved")
     added_url = None
 
     if module.get("dev", False) and not include_devel:
-        pass
+        return
     if module.get("bundled", False):
         pass
-    elif module.get("resolved", False) or (version.startswith("http") and not version.endswith(".git")):
-        if module.get("resolved", False):
-            url = module["resolved"]
+    elif resolved or (version.startswith("http") and not version.endswith(".git")):
+        if resolved:
+            url = resolved
         else:
-            url = module["version"]
+            url = version
         added_url = url
         integrity = module["integrity"]
 
-        integrity_type, integrity_base64 = integrity.split("-", 2)
-        hex = binascii.hexlify(base64.b64decode(integrity_base64)).decode('utf8')
-
-        if npm3:
-            dest = "npm-cache/" + name + "/" + module["version"] + "/"
-            destFilename = "package.tgz"
-        else:
-            dest = "npm-cache/_cacache/content-v2/%s/%s/%s" % (integrity_type, hex[0:2], hex[2:4])
-            destFilename = hex[4:]
-
+        # Tarballs shared between packages or lockfiles only need decoding once.
         if integrity not in seen:
             seen[integrity] = True
+
+            integrity_type, integrity_base64 = integrity.split("-", 2)
+            hex = base64.b64decode(integrity_base64).hex()
+
+            if npm3:
+                dest = "npm-cache/" + name + "/" + module["version"] + "/"
+                destFilename = "package.tgz"
+            else:
+                dest = "npm-cache/_cacache/content-v2/%s/%s/%s" % (integrity_type, hex[0:2], hex[2:4])
+                destFilename = hex[4:]
+
             source = {"type": "file",
                       "url": url,
                       "dest": dest,
                       "dest-filename": destFilename}
             source[integrity_type] = hex
             sources.append(source)
-    elif isGitUrl(module["version"]):
-        parsedUrl = parseGitUrl(module["version"])
+    elif isGitUrl(version):
+        parsedUrl = parseGitUrl(version)
         subdir = "npm-cache/git/" + parsedUrl["name"]
         source = {
             "type": "git",
@@ -147,9 +250,9 @@ def getModuleSources(module, name, seen=None, include_devel=True, npm3=False):
             "dest": subdir
         }
         sources.append(source)
-        parsedUrl["sedCommandLock"] = "sed -i 's^" + module["version"] + "^git+file:/var/tmp/build-dir/" + subdir + "#" + parsedUrl["commit"] + "^g' package-lock.json"
+        parsedUrl["sedCommandLock"] = "sed -i 's^" + version + "^git+file:/var/tmp/build-dir/" + subdir + "#" + parsedUrl["commit"] + "^g' package-lock.json"
 
-        parsedFromUrl = getPathandCommitInfo(module["version"])
+        parsedFromUrl = getPathandCommitInfo(version)
         parsedUrl["sedCommandFrom"] = (
             "sed -i 's^\"from\": \"" + parsedFromUrl["path"] +
             "\",^^g' package-lock.json")
@@ -160,46 +263,41 @@ def getModuleSources(module, name, seen=None, include_devel=True, npm3=False):
 
     if added_url:
         # Special case electron, adding sources for the electron binaries
-        tarname = added_url[added_url.rfind("/")+1:]
-        if tarname.startswith("electron-") and tarname[len("electron-")].isdigit() and tarname.endswith(".tgz"):
-            electron_version = tarname[len("electron-"):-len(".tgz")]
-
-            shasums_url = "https://github.com/electron/electron/releases/download/v" + electron_version + "/SHASUMS256.txt"
-            f = urllib.request.urlopen(shasums_url)
-            shasums = {}
-            shasums_data = f.read().decode("utf8")
-            for line in shasums_data.split('\n'):
-                l = line.split()
-                if len(l) == 2:
-                    shasums[l[1][1:]] = l[0]
-
-            mini_shasums = ""
-            for arch in electron_arches.keys():
-                basename = "electron-v" + electron_version + "-linux-" + arch + ".zip"
-                if not basename in shasums:
-                      continue
-                source = {"type": "file",
-                          "only-arches": [electron_arches[arch]],
-                          "url": "https://github.com/electron/electron/releases/download/v" + electron_version + "/" + basename,
-                          "sha256": shasums[basename],
-                          "dest": "npm-cache"}
-                sources.append(source)
-                mini_shasums = mini_shasums + shasums[basename] + " *" + basename + "\n"
-            source = {"type": "file",
-                      "url": "data:" + urllib.parse.quote(mini_shasums.encode("utf8")),
-                      "dest": "npm-cache",
-                      "dest-filename": "SHASUMS256.txt-" + electron_version}
-            sources.append(source)
+        electron_version = getElectronVersion(added_url)
+        if electron_version is not None:
+            addElectronSources(electron_version, sources)
+
+def iterModules(module, name, include_devel=True):
+    # Walk the dependency tree depth-first with an explicit stack instead of
+    # recursing, so deep trees don't hit the recursion limit.
+    stack = [(module, name)]
+    while stack:
+        module, name = stack.pop()
+        # Everything below a development dependency is only needed for development too.
+        if module.get("dev", False) and not include_devel:
+            continue
+        yield module, name
+
+        if "dependencies" in module:
+            deps = module["dependencies"]
+            # Push in reverse, so the dependencies are still visited in sorted order.
+            for dep in sorted(deps, reverse=True):
+                stack.append((deps[dep], dep))
+
+def getModuleListSources(modules, seen=None, include_devel=True, npm3=False):
+    sources = []
+    patches = []
+    if seen is None:
+        seen = {}
 
-    if "dependencies" in module:
-        deps = module["dependencies"]
-        for dep in sorted(deps):
-            child_sources = getModuleSources(deps[dep], seen, include_devel=include_devel)
-            sources += child_sources["sources"]
-            patches += child_sources["patches"]
+    for module, name in modules:
+        addModuleSources(module, name, sources, patches, seen, include_devel, npm3)
 
     return {"sources": sources, "patches": patches}
 
+def getModuleSources(module, name, seen=None, include_devel=True, npm3=False):
+    return getModuleListSources(iterModules(module, name, include_devel), seen, include_devel, npm3)
+
 def main():
     parser = argparse.ArgumentParser(description='Flatpak NPM generator')
     parser.add_argument('lockfile', type=str)
@@ -232,13 +330,19 @@ def main():
         }
     ]
 
+    # Flatten each dependency tree once, so the Electron prefetch and the source
+    # generation don't both have to walk it.
+    trees = []
     for lockfile in lockfiles:
-        print('Scanning "%s" ' % lockfile, file=sys.stderr)
+        with open(lockfile, 'rb') as f:
+            trees.append((lockfile, list(iterModules(loadJson(f.read()), None, include_devel))))
 
-        with open(lockfile, 'r') as f:
-            root = json.loads(f.read())
+    prefetchElectronShasums(modules for _, modules in trees)
+
+    for lockfile, modules in trees:
+        print('Scanning "%s" ' % lockfile, file=sys.stderr)
 
-        s = getModuleSources(root, None, seen, include_devel=include_devel, npm3=npm3)
+        s = getModuleListSources(modules, seen, include_devel=include_devel, npm3=npm3)
         sources += s["sources"]
         patches += s["patches"]
         print(' ... %d new sources' % len(s["sources"]), file=sys.stderr)
@@ -254,8 +358,8 @@ def main():
         ]
 
     print('Writing to "%s"' % sourcesOutFile)
-    with open(sourcesOutFile, 'w') as f:
-        f.write(json.dumps(sources, indent=4, sort_keys = True))
+    with open(sourcesOutFile, 'wb') as f:
+        writeJsonList(sources, f)
 
 if __name__ == '__main__':
     main()
@@ -3,6 +3,7 @@
 __license__ = "MIT"
 
 import argparse
+import concurrent.futures
 import sys
 import json
 import re
@@ -17,8 +18,24 @@ electron_arches = {
     "x64": "x86_64"
 }
 
+def getRemoteSha1(url):
+    with urllib.request.urlopen(url) as f:
+        # Hash the tarball as it arrives instead of holding it all in memory
+        if hasattr(hashlib, 'file_digest'):
+            # Python 3.11+ does the read loop in C, without per-chunk bytes objects
+            return hashlib.file_digest(f, 'sha1').hexdigest()
+
+        shasum = hashlib.sha1()
+        while True:
+            buf = f.read(1024 * 1024)
+            if not buf:
+                break
+            shasum.update(buf)
+        return shasum.hexdigest()
+
 def getModuleSources(lockfile, include_devel=True):
     sources = []
+    unhashedSources = []
     currentSource = ''
     currentSourceVersion = ''
     yarnVersion = ''
@@ -63,16 +80,13 @@ def getModuleSources(lockfile, include_devel=True):
             tempList = re.split('#', resolvedStrippedStr)
             if len(tempList) == 1:
                 filename = re.split('/', tempList[0])[-1].strip('\n')
-                shasum = hashlib.sha1()
-                with urllib.request.urlopen(tempList[0]) as f:
-                    buf = f.read()
-                    shasum.update(buf)
-                tempList.append(shasum.hexdigest())
+                # The hash is filled in below, once all tarballs have been downloaded
                 source = {'type': 'file',
                       'url': tempList[0],
-                      'sha1': tempList[1],
+                      'sha1': None,
                       'dest': 'yarn-mirror',
                       'dest-filename': filename}
+                unhashedSources.append(source)
             else:
                 source = {'type': 'file',
                         'url': tempList[0],
@@ -81,7 +95,14 @@ def getModuleSources(lockfile, include_devel=True):
                         'dest-filename': currentSource + '-' + currentSourceVersion + '.tgz'}
             currentSource = ''
             sources.append(source)
-    
+
+    # Tarballs without a hash in the lockfile have to be downloaded to be hashed,
+    # which is network bound, so fetch them concurrently.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        hashes = executor.map(getRemoteSha1, [source['url'] for source in unhashedSources])
+        for source, sha1 in zip(unhashedSources, hashes):
+            source['sha1'] = sha1
+
     return sources
 
 def main():